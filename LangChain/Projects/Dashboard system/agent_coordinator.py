@@ -3,8 +3,12 @@ Agent Coordinator - Manages interaction between agents and OpenRouter LLM
 Handles prompt engineering and agent orchestration
 """
 
+import hashlib
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any, Optional
 import pandas as pd
 import requests
@@ -14,12 +18,26 @@ class AgentCoordinator:
     """
     Coordinates between Data Architect, Visualization Agent, and OpenRouter LLM (Gemma3 27B)
     """
-    
+
+    # Upper bound on concurrent OpenRouter requests when generating a batch of charts
+    MAX_PARALLEL_REQUESTS = 4
+
+    # Number of validated LLM code snippets kept per coordinator
+    CODE_CACHE_SIZE = 128
+
     def __init__(self, model_name: str = "google/gemma-3-27b-it", api_key: Optional[str] = None):
         self.model_name = model_name
         self.llm_available = False
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self._viz_agent = None
+        self._code_cache = {}
+        # Guards _code_cache; generation runs on many threads at once
+        self._code_cache_lock = threading.Lock()
+        # Keep-alive sessions so repeated requests skip the TCP/TLS handshake;
+        # one per thread, since this coordinator is shared across sessions and
+        # batch workers and requests.Session is not thread-safe
+        self._http_local = threading.local()
         
         # Check if API key is available
         if self.api_key:
@@ -60,6 +78,12 @@ Return ONLY the Python code, no explanations.
     
     def _get_columns_context(self, df: pd.DataFrame) -> str:
         """Creates a readable summary of available columns"""
+        return self._columns_context(tuple(df.columns))
+    
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _columns_context(columns: tuple) -> str:
+        """Groups column names by theme; cached since it only depends on the names"""
         column_groups = {
             'Demographics': [],
             'Spending': [],
@@ -69,7 +93,7 @@ Return ONLY the Python code, no explanations.
             'Other': []
         }
         
-        for col in df.columns:
+        for col in columns:
             if col.startswith('education_') or col.startswith('marital_') or col in ['Age', 'Income']:
                 column_groups['Demographics'].append(col)
             elif col.startswith('Mnt'):
@@ -115,7 +139,7 @@ Return ONLY the Python code, no explanations.
                 "max_tokens": 2000
             }
             
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
+            response = self._get_http_session().post(self.api_url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -174,6 +198,13 @@ Return ONLY the Python code, no explanations.
         method_used: 'llm' or 'rule-based'
         """
         if use_llm and self.llm_available:
+            # Reuse code already generated for this prompt against the same schema
+            cache_key = self._code_cache_key(user_prompt, df)
+            with self._code_cache_lock:
+                cached_code = self._code_cache.get(cache_key)
+            if cached_code is not None:
+                return cached_code, 'llm'
+            
             # Try OpenRouter LLM first
             enhanced_prompt = self.enhance_prompt_with_context(user_prompt, df)
             response = self.query_llm(enhanced_prompt)
@@ -183,16 +214,65 @@ Return ONLY the Python code, no explanations.
                 if code and 'fig' in code:
                     # Validate the code has correct syntax before returning
                     if self._validate_code_syntax(code):
+                        self._store_code(cache_key, code)
                         return code, 'llm'
                         print("Warning: LLM generated invalid code, falling back to rule-based")
         
         # Fallback to rule-based (Visualization Agent)
-        from visualization_agent import VisualizationAgent
-        viz_agent = VisualizationAgent()
-        code, chart_type = viz_agent.create_visualization_from_prompt(user_prompt, df)
-        
+        code, chart_type = self._get_viz_agent().create_visualization_from_prompt(user_prompt, df)
+
         return code, 'rule-based'
-    
+
+    def _code_cache_key(self, user_prompt: str, df: pd.DataFrame) -> str:
+        """Content hash of the prompt plus the column names/dtypes it was generated for"""
+        schema = "|".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items())
+        payload = f"{schema}\n{user_prompt.strip()}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def invalidate_code(self, user_prompt: str, df: pd.DataFrame):
+        """Forgets cached LLM code for a prompt, e.g. after it failed to execute"""
+        cache_key = self._code_cache_key(user_prompt, df)
+        with self._code_cache_lock:
+            self._code_cache.pop(cache_key, None)
+
+    def _store_code(self, cache_key: str, code: str):
+        """Caches validated LLM code, evicting the oldest entry when full"""
+        with self._code_cache_lock:
+            if cache_key not in self._code_cache and len(self._code_cache) >= self.CODE_CACHE_SIZE:
+                self._code_cache.pop(next(iter(self._code_cache)))
+            self._code_cache[cache_key] = code
+
+    def _get_http_session(self) -> requests.Session:
+        """Returns the calling thread's HTTP session, creating it on first use"""
+        session = getattr(self._http_local, 'session', None)
+        if session is None:
+            session = self._http_local.session = requests.Session()
+        return session
+
+    def _get_viz_agent(self):
+        """Returns the rule-based Visualization Agent, building it on first use"""
+        if self._viz_agent is None:
+            from visualization_agent import VisualizationAgent
+            self._viz_agent = VisualizationAgent()
+        return self._viz_agent
+
+    def generate_visualization_codes(self, user_prompts: list, df: pd.DataFrame,
+                                     use_llm: bool = True):
+        """
+        Generates code for several prompts, overlapping the OpenRouter round-trips
+        Yields: (code, method_used) in the same order as user_prompts, each one
+        as soon as it is ready so callers can render incrementally
+        """
+        if not user_prompts:
+            return
+
+        workers = min(self.MAX_PARALLEL_REQUESTS, len(user_prompts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(
+                lambda prompt: self.generate_visualization_code(prompt, df, use_llm),
+                user_prompts
+            )
+
     def _validate_code_syntax(self, code: str) -> bool:
         """
         Quick validation of generated code syntax
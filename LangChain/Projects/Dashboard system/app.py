@@ -5,10 +5,7 @@ Interactive analytics dashboard powered by Ollama Mistral 7B
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
-import sys
 
 # Import custom modules
 from data_architect import DataArchitect, clean_customer_data
@@ -69,8 +66,24 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_coordinator():
+    """Process-wide AgentCoordinator so its HTTP session and code cache are shared"""
+    return AgentCoordinator()
+
+
+@st.cache_resource
+def get_viz_agent():
+    """Process-wide Visualization Agent (stateless, safe to share across sessions)"""
+    return VisualizationAgent()
+
+
 def initialize_session_state():
     """Initialize all session state variables"""
+    # Only the first run of a session needs to populate defaults
+    if st.session_state.get('initialized'):
+        return
+
     if 'data_loaded' not in st.session_state:
         st.session_state.data_loaded = False
     
@@ -83,28 +96,55 @@ def initialize_session_state():
     if 'cleaning_report' not in st.session_state:
         st.session_state.cleaning_report = ""
     
+    if 'data_summary' not in st.session_state:
+        st.session_state.data_summary = None
+    
     if 'coordinator' not in st.session_state:
-        st.session_state.coordinator = AgentCoordinator()
+        st.session_state.coordinator = get_coordinator()
     
     if 'viz_agent' not in st.session_state:
-        st.session_state.viz_agent = VisualizationAgent()
+        st.session_state.viz_agent = get_viz_agent()
+
+    st.session_state.initialized = True
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_and_clean_csv_file(path: str, mtime: float):
+    """Load and clean a CSV on disk; mtime is part of the cache key so edits reload it"""
+    return clean_customer_data(pd.read_csv(path), copy=False)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame for download once, instead of on every rerun"""
+    return df.to_csv(index=False).encode('utf-8')
 
 
 def load_and_clean_data(uploaded_file):
     """Load and clean the dataset using Data Architect"""
     try:
-        # Load data
-        df = pd.read_csv(uploaded_file)
-        
-        # Clean data using Data Architect
-        with st.spinner("🔧 Data Architect is cleaning your data..."):
-            architect = DataArchitect()
-            df_clean = architect.clean_data(df)
-            report = architect.get_cleaning_report()
+        if isinstance(uploaded_file, Path):
+            # Files on disk (the default dataset) are cleaned once per modification
+            with st.spinner("🔧 Data Architect is cleaning your data..."):
+                df_clean, report = load_and_clean_csv_file(
+                    str(uploaded_file), uploaded_file.stat().st_mtime
+                )
+        else:
+            # Load data
+            df = pd.read_csv(uploaded_file)
+            
+            # Clean data using Data Architect
+            with st.spinner("🔧 Data Architect is cleaning your data..."):
+                architect = DataArchitect()
+                # The raw frame is not used again, so clean it in place
+                df_clean = architect.clean_data(df, copy=False)
+                report = architect.get_cleaning_report()
         
-        # Store in session state
+        # Store in session state; the summary is computed once here rather
+        # than rescanning the frame on every rerun of the sidebar
         st.session_state.df_clean = df_clean
         st.session_state.cleaning_report = report
+        st.session_state.data_summary = DataArchitect().get_data_summary(df_clean)
         st.session_state.data_loaded = True
         
         return df_clean, report
@@ -114,6 +154,16 @@ def load_and_clean_data(uploaded_file):
         return None, None
 
 
+def clear_all_charts():
+    """Button callback: runs before the rerun the click triggers, so no extra rerun"""
+    st.session_state.history_charts = []
+
+
+def delete_chart(index: int):
+    """Button callback removing a single chart from the gallery"""
+    st.session_state.history_charts.pop(index)
+
+
 def render_sidebar():
     """Render the sidebar with controls and information"""
     with st.sidebar:
@@ -138,10 +188,10 @@ def render_sidebar():
         # Data information
         if st.session_state.data_loaded:
             with st.expander("📊 Dataset Info", expanded=False):
-                df = st.session_state.df_clean
-                st.metric("Total Rows", len(df))
-                st.metric("Total Columns", len(df.columns))
-                st.metric("Missing Values", df.isnull().sum().sum())
+                summary = st.session_state.data_summary
+                st.metric("Total Rows", summary['total_rows'])
+                st.metric("Total Columns", summary['total_columns'])
+                st.metric("Missing Values", summary['missing_values'])
                 
                 if st.button("View Cleaning Report"):
                     st.text_area("Cleaning Report", 
@@ -152,13 +202,11 @@ def render_sidebar():
         st.markdown("---")
         st.markdown("### ⚡ Quick Actions")
         
-        if st.button("🗑️ Clear All Charts"):
-            st.session_state.history_charts = []
-            st.rerun()
+        st.button("🗑️ Clear All Charts", on_click=clear_all_charts)
         
         if st.button("💾 Download Clean Data"):
             if st.session_state.df_clean is not None:
-                csv = st.session_state.df_clean.to_csv(index=False)
+                csv = dataframe_to_csv_bytes(st.session_state.df_clean)
                 st.download_button(
                     label="📥 Download CSV",
                     data=csv,
@@ -184,29 +232,40 @@ def load_dashboard_prompts(dashboard_name: str):
         st.warning("Please load data first!")
         return
     
-    with st.spinner(f"Loading {dashboard_name}..."):
-        for prompt_config in prompts:
-            prompt = prompt_config['prompt']
-            
-            # Generate visualization
-            code, method = st.session_state.coordinator.generate_visualization_code(
-                prompt, st.session_state.df_clean
+    progress = st.progress(0.0, text=f"Loading {dashboard_name}...")
+    
+    # LLM requests run concurrently; each figure is built, in prompt order,
+    # as soon as its code arrives so progress is visible while the rest load
+    results = st.session_state.coordinator.generate_visualization_codes(
+        [prompt_config['prompt'] for prompt_config in prompts],
+        st.session_state.df_clean
+    )
+    
+    for done, (prompt_config, (code, method)) in enumerate(zip(prompts, results), start=1):
+        prompt = prompt_config['prompt']
+        
+        if code:
+            fig, succeeded = st.session_state.viz_agent.run_visualization_code(
+                code, st.session_state.df_clean
             )
             
-            if code:
-                fig = st.session_state.viz_agent.execute_visualization_code(
-                    code, st.session_state.df_clean
-                )
-                
-                if fig:
-                    # Add to history
-                    st.session_state.history_charts.append({
-                        'title': prompt_config['title'],
-                        'fig': fig,
-                        'prompt': prompt
-                    })
+            if method == 'llm' and not succeeded:
+                # Don't keep serving code that failed; the next request re-asks the LLM
+                st.session_state.coordinator.invalidate_code(prompt, st.session_state.df_clean)
+            
+            if fig:
+                # Add to history
+                st.session_state.history_charts.append({
+                    'title': prompt_config['title'],
+                    'fig': fig,
+                    'prompt': prompt
+                })
+        
+        progress.progress(done / len(prompts),
+                          text=f"Loaded {done}/{len(prompts)}: {prompt_config['title']}")
     
-    st.rerun()
+    # The gallery renders after the sidebar in this same run, so no rerun is needed
+    progress.empty()
 
 
 def render_main_content():
@@ -328,14 +387,8 @@ def render_visualization_creator():
     st.markdown("---")
     st.markdown("#### ⚡ Quick Visualizations")
     
-    quick_viz_cols = st.columns(4)
-    
-    quick_prompts = [
-        ("📊 Spending Overview", "Compare average spending across all Mnt categories"),
-        ("👥 Demographics", "Show Age vs Income scatter plot"),
-        ("🎯 Campaign Success", "Bar chart of campaign acceptance rates"),
-        ("🔗 Correlations", "Heatmap of Income, Recency, MntWines, MntTotal")
-    ]
+    quick_prompts = templates.get_quick_prompts()
+    quick_viz_cols = st.columns(len(quick_prompts))
     
     for idx, (label, prompt) in enumerate(quick_prompts):
         with quick_viz_cols[idx]:
@@ -354,10 +407,14 @@ def generate_and_display_chart(prompt: str, use_llm: bool = True):
             
             if code:
                 # Execute code to create figure
-                fig = st.session_state.viz_agent.execute_visualization_code(
+                fig, succeeded = st.session_state.viz_agent.run_visualization_code(
                     code, st.session_state.df_clean
                 )
                 
+                if method == 'llm' and not succeeded:
+                    # Don't keep serving code that failed; the next request re-asks the LLM
+                    st.session_state.coordinator.invalidate_code(prompt, st.session_state.df_clean)
+                
                 if fig:
                     # Add to history
                     st.session_state.history_charts.append({
@@ -367,8 +424,9 @@ def generate_and_display_chart(prompt: str, use_llm: bool = True):
                         'method': method
                     })
                     
+                    # The gallery tab renders after this one in the same run and
+                    # picks up the new chart without a full script rerun
                     st.success(f"✅ Visualization created using: {method}")
-                    st.rerun()
                 else:
                     st.error("❌ Failed to create visualization. The generated code didn't produce a valid figure.")
                     with st.expander("Debug: View Generated Code"):
@@ -394,38 +452,24 @@ def render_chart_gallery():
     
     # Render charts side by side (2 per row)
     charts = st.session_state.history_charts
+    charts_per_row = 2
     
-    for i in range(0, len(charts), 2):
-        cols = st.columns(2)
+    for row_start in range(0, len(charts), charts_per_row):
+        cols = st.columns(charts_per_row)
+        row_end = min(row_start + charts_per_row, len(charts))
         
-        # First chart
-        with cols[0]:
-            chart_data = charts[i]
-            st.markdown(f"**{i+1}. {chart_data['title']}**")
-            st.plotly_chart(chart_data['fig'], use_container_width=True, key=f"chart_{i}")
-            
-            col_a, col_b = st.columns([3, 1])
-            with col_a:
-                st.caption(f"Method: {chart_data.get('method', 'N/A')}")
-            with col_b:
-                if st.button("🗑️", key=f"del_{i}"):
-                    st.session_state.history_charts.pop(i)
-                    st.rerun()
-        
-        # Second chart (if exists)
-        if i + 1 < len(charts):
-            with cols[1]:
-                chart_data = charts[i + 1]
-                st.markdown(f"**{i+2}. {chart_data['title']}**")
-                st.plotly_chart(chart_data['fig'], use_container_width=True, key=f"chart_{i+1}")
+        # zip stops at the last chart, leaving a short final row's column empty
+        for i, col in zip(range(row_start, row_end), cols):
+            with col:
+                chart_data = charts[i]
+                st.markdown(f"**{i+1}. {chart_data['title']}**")
+                st.plotly_chart(chart_data['fig'], use_container_width=True, key=f"chart_{i}")
                 
                 col_a, col_b = st.columns([3, 1])
                 with col_a:
                     st.caption(f"Method: {chart_data.get('method', 'N/A')}")
                 with col_b:
-                    if st.button("🗑️", key=f"del_{i+1}"):
-                        st.session_state.history_charts.pop(i + 1)
-                        st.rerun()
+                    st.button("🗑️", key=f"del_{i}", on_click=delete_chart, args=(i,))
         
         st.markdown("---")
 
@@ -483,7 +527,7 @@ def render_data_analysis():
         st.dataframe(st.session_state.df_clean.head(100), use_container_width=True)
         
         # Download full dataset
-        csv = st.session_state.df_clean.to_csv(index=False)
+        csv = dataframe_to_csv_bytes(st.session_state.df_clean)
         st.download_button(
             label="📥 Download Full Dataset",
             data=csv,
@@ -151,13 +151,22 @@ ALL_DASHBOARDS = [
     PRODUCT_DASHBOARD
 ]
 
+# Case-insensitive name lookup, built once at import
+DASHBOARDS_BY_NAME = {d['name'].lower(): d for d in ALL_DASHBOARDS}
+
+
+# One-click prompts shown under "Quick Visualizations" as (button label, prompt)
+QUICK_PROMPTS = (
+    ("📊 Spending Overview", "Compare average spending across all Mnt categories"),
+    ("👥 Demographics", "Show Age vs Income scatter plot"),
+    ("🎯 Campaign Success", "Bar chart of campaign acceptance rates"),
+    ("🔗 Correlations", "Heatmap of Income, Recency, MntWines, MntTotal")
+)
+
 
 def get_dashboard_by_name(name: str):
     """Get a specific dashboard configuration by name"""
-    for dashboard in ALL_DASHBOARDS:
-        if dashboard['name'].lower() == name.lower():
-            return dashboard
-    return None
+    return DASHBOARDS_BY_NAME.get(name.lower())
 
 
 def get_all_dashboard_names():
@@ -165,6 +174,11 @@ def get_all_dashboard_names():
     return [d['name'] for d in ALL_DASHBOARDS]
 
 
+def get_quick_prompts():
+    """Get the (label, prompt) pairs for the quick visualization buttons"""
+    return QUICK_PROMPTS
+
+
 def get_prompts_for_dashboard(dashboard_name: str):
     """Get all prompts for a specific dashboard"""
     dashboard = get_dashboard_by_name(dashboard_name)
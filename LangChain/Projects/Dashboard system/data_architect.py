@@ -4,7 +4,6 @@ Uses Context-Task-Formatting framework for data transformations
 """
 
 import pandas as pd
-import numpy as np
 from datetime import datetime
 
 
@@ -16,14 +15,15 @@ class DataArchitect:
     def __init__(self):
         self.cleaning_report = []
     
-    def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    def clean_data(self, df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
         """
         Main cleaning function following the specified logic:
         - Income: Median imputation grouped by education
         - Categorical/Binary: Mode imputation
         - Feature Engineering: Convert Mnt columns, calculate Customer_Days
+        Pass copy=False to clean df in place when the caller no longer needs the raw frame
         """
-        df_clean = df.copy()
+        df_clean = df.copy() if copy else df
         
         # Step 1: Handle Income with Median Imputation grouped by Education
         df_clean = self._impute_income_by_education(df_clean)
@@ -63,18 +63,21 @@ class DataArchitect:
                 self.cleaning_report.append(f"✓ Imputed {df['Income'].isnull().sum()} Income values with overall median: {median_income:.2f}")
         else:
             # Group by education and impute
-            missing_before = df['Income'].isnull().sum()
+            missing = df['Income'].isnull().to_numpy(copy=True)
+            missing_before = int(missing.sum())
             
             for edu_col in education_cols:
                 # For rows where this education is 1 and income is missing
-                mask = (df[edu_col] == 1) & (df['Income'].isnull())
+                in_group = (df[edu_col] == 1).to_numpy()
+                mask = in_group & missing
                 
-                if mask.sum() > 0:
-                    # Calculate median income for this education group
-                    median_income = df[df[edu_col] == 1]['Income'].median()
+                if mask.any():
+                    # Median over the group's Income values only, without copying its rows
+                    median_income = df.loc[in_group, 'Income'].median()
                     
                     if pd.notna(median_income):
                         df.loc[mask, 'Income'] = median_income
+                        missing = missing & ~mask
                         self.cleaning_report.append(f"✓ Imputed {mask.sum()} Income values for {edu_col} with median: {median_income:.2f}")
             
             # Handle any remaining missing values with overall median
@@ -104,9 +107,11 @@ class DataArchitect:
         all_categorical = categorical_cols + binary_cols
         
         for col in all_categorical:
-            if df[col].isnull().sum() > 0:
-                mode_value = df[col].mode()[0] if len(df[col].mode()) > 0 else df[col].value_counts().index[0]
-                missing_count = df[col].isnull().sum()
+            missing_count = df[col].isnull().sum()
+            if missing_count > 0:
+                # mode() counts every distinct value, so run it once per column
+                modes = df[col].mode()
+                mode_value = modes[0] if len(modes) > 0 else df[col].value_counts().index[0]
                 df[col].fillna(mode_value, inplace=True)
                 self.cleaning_report.append(f"✓ Imputed {missing_count} values in {col} with mode: {mode_value}")
         
@@ -121,8 +126,9 @@ class DataArchitect:
         mnt_cols = [col for col in df.columns if col.startswith('Mnt')]
         
         for col in mnt_cols:
-            # Convert to numeric, coercing errors
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Convert to numeric, coercing errors (numeric columns need no parse)
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
             
             # Fill any resulting NaNs with 0 (assumption: no purchase = 0 spent)
             if df[col].isnull().sum() > 0:
@@ -141,13 +147,14 @@ class DataArchitect:
         date_cols = [col for col in df.columns if 'date' in col.lower() or 'dt' in col.lower()]
         
         if date_cols:
+            reference_date = pd.Timestamp.today()
+            
             for col in date_cols:
                 try:
                     # Convert to datetime
                     df[col] = pd.to_datetime(df[col], errors='coerce')
                     
                     # Calculate days from today
-                    reference_date = pd.Timestamp.today()
                     df[f'{col}_Days'] = (reference_date - df[col]).dt.days
                     
                     self.cleaning_report.append(f"✓ Created {col}_Days column")
@@ -200,13 +207,32 @@ class DataArchitect:
         """
         Returns a comprehensive summary of the cleaned dataset
         """
+        # Classify columns from one read of the dtypes rather than building a
+        # sub-frame per kind with select_dtypes; like select_dtypes(np.number),
+        # booleans are not numeric and timedeltas are
+        kinds = [
+            'categorical' if dtype == object or isinstance(dtype, pd.CategoricalDtype)
+            else 'numeric' if (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype))
+            or pd.api.types.is_timedelta64_dtype(dtype)
+            else 'other'
+            for dtype in df.dtypes
+        ]
+        categorical_count = kinds.count('categorical')
+        
+        # deep=True walks every Python object (and category labels), so only ask
+        # for it when some column holds strings or objects
+        needs_deep = any(
+            dtype == object or isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)
+            for dtype in df.dtypes
+        )
+        
         summary = {
             "total_rows": len(df),
             "total_columns": len(df.columns),
             "missing_values": df.isnull().sum().sum(),
-            "numeric_columns": len(df.select_dtypes(include=[np.number]).columns),
-            "categorical_columns": len(df.select_dtypes(include=['object', 'category']).columns),
-            "memory_usage_mb": df.memory_usage(deep=True).sum() / 1024 / 1024,
+            "numeric_columns": kinds.count('numeric'),
+            "categorical_columns": categorical_count,
+            "memory_usage_mb": df.memory_usage(deep=needs_deep).sum() / 1024 / 1024,
             "column_list": df.columns.tolist()
         }
         
@@ -214,12 +240,12 @@ class DataArchitect:
 
 
 # Utility function for easy access
-def clean_customer_data(df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
+def clean_customer_data(df: pd.DataFrame, copy: bool = True) -> tuple[pd.DataFrame, str]:
     """
     Convenience function to clean data and return cleaned df + report
     """
     architect = DataArchitect()
-    cleaned_df = architect.clean_data(df)
+    cleaned_df = architect.clean_data(df, copy=copy)
     report = architect.get_cleaning_report()
     
     return cleaned_df, report
@@ -9,6 +9,13 @@ import plotly.graph_objects as go
 from typing import Dict, Any
 import json
 import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _pretty_label(col: str) -> str:
+    """Column name as an axis/title label, e.g. 'Customer_Days' -> 'Customer Days'"""
+    return col.replace('_', ' ').title()
 
 
 class VisualizationAgent:
@@ -17,6 +24,12 @@ class VisualizationAgent:
     Interprets requests through Context + Task + Formatting framework
     """
     
+    # Scatter plots of larger frames are drawn from a fixed random sample of this size
+    SCATTER_MAX_POINTS = 50_000
+    
+    # Above this many rows scatter plots render with WebGL instead of SVG
+    SCATTER_WEBGL_ROWS = 5_000
+    
     def __init__(self):
         self.persona_prompt = """
 You are a Senior Marketing & Financial Analyst with expertise in customer analytics.
@@ -57,6 +70,15 @@ When generating code:
 5. Code should be ready to execute with exec()
 """
         
+        # Code builder for each chart type parse_visualization_request can return
+        self._code_builders = {
+            'kpi': self._kpi_code,
+            'bar': self._bar_code,
+            'scatter': self._scatter_code,
+            'heatmap': self._heatmap_code,
+            'treemap': self._treemap_code
+        }
+        
         self.color_palettes = {
             'default': px.colors.qualitative.Plotly,
             'viridis': px.colors.sequential.Viridis,
@@ -172,7 +194,7 @@ When generating code:
             elif condition['operator'] == 'gt' and value > condition['value']:
                 color = condition.get('color', 'red')
         
-        metric_title = metric_col.replace('_', ' ').title()
+        metric_title = _pretty_label(metric_col)
         
         code = f"""
 # KPI Card for {metric_col}
@@ -204,14 +226,17 @@ fig.update_layout(
         elif sorting == 'ascending':
             sort_code = ".sort_values(ascending=True)"
         
-        x_label = x_col.replace("_", " ").title()
-        y_label = y_col.replace("_", " ").title()
+        # Key order is thrown away by a value sort, so only pay for it without one
+        group_sort = ", sort=False" if sort_code else ""
+        
+        x_label = _pretty_label(x_col)
+        y_label = _pretty_label(y_col)
         agg_title = aggregation.title()
         chart_title = f"{agg_title} {y_label} by {x_label}"
         
         code = f"""
 # Bar Chart: {y_col} by {x_col}
-grouped_data = df.groupby('{x_col}')['{y_col}'].{aggregation}(){sort_code}.reset_index()
+grouped_data = df.groupby('{x_col}'{group_sort})['{y_col}'].{aggregation}(){sort_code}.reset_index()
 
 fig = px.bar(
     grouped_data,
@@ -236,16 +261,29 @@ fig.update_layout(
                              df: pd.DataFrame = None) -> str:
         """Generates code for a scatter plot"""
         color_param = f", color='{color_col}'" if color_col else ""
+        x_label = _pretty_label(x_col)
+        y_label = _pretty_label(y_col)
+        
+        # Every point is serialized and drawn in the browser, so cap very large frames
+        data_var = "df"
+        sample_code = ""
+        if df is not None and len(df) > self.SCATTER_MAX_POINTS:
+            data_var = "plot_data"
+            sample_code = f"plot_data = df.sample(n={self.SCATTER_MAX_POINTS}, random_state=0)\n"
+        
+        render_param = ""
+        if df is not None and len(df) > self.SCATTER_WEBGL_ROWS:
+            render_param = "\n    render_mode='webgl',"
         
         code = f"""
 # Scatter Plot: {y_col} vs {x_col}
-fig = px.scatter(
-    df,
+{sample_code}fig = px.scatter(
+    {data_var},
     x='{x_col}',
     y='{y_col}'{color_param},
-    title='{y_col.replace("_", " ").title()} vs {x_col.replace("_", " ").title()}',
-    labels={{'{x_col}': '{x_col.replace("_", " ").title()}', '{y_col}': '{y_col.replace("_", " ").title()}'}},
-    template='plotly_dark',
+    title='{y_label} vs {x_label}',
+    labels={{'{x_col}': '{x_label}', '{y_col}': '{y_label}'}},
+    template='plotly_dark',{render_param}
     opacity=0.7
 )
 
@@ -281,13 +319,13 @@ fig.update_layout(
     
     def generate_treemap_code(self, values_col: str, group_col: str) -> str:
         """Generates code for a treemap"""
-        values_label = values_col.replace("_", " ").title()
-        group_label = group_col.replace("_", " ").title()
+        values_label = _pretty_label(values_col)
+        group_label = _pretty_label(group_col)
         chart_title = f"{values_label} Distribution by {group_label}"
         
         code = f"""
 # Treemap: {values_col} grouped by {group_col}
-grouped_data = df.groupby('{group_col}')['{values_col}'].sum().reset_index()
+grouped_data = df.groupby('{group_col}', sort=False)['{values_col}'].sum().reset_index()
 
 fig = px.treemap(
     grouped_data,
@@ -310,90 +348,16 @@ fig.update_layout(height=500)
         """
         parsed = self.parse_visualization_request(prompt, df)
         chart_type = parsed['chart_type']
-        columns = parsed['columns']
         
-        code = ""
+        # Classify columns by dtype once instead of in every branch
+        num_cols = df.select_dtypes(include=['number']).columns
+        cat_cols = df.select_dtypes(include=['object', 'category']).columns
         
-        try:
-            if chart_type == 'kpi':
-                metric_col = columns[0] if columns else 'Response'
-                code = self.generate_kpi_code(metric_col, df, parsed['color_condition'])
-            
-            elif chart_type == 'bar':
-                if len(columns) >= 2:
-                    # Check if columns exist
-                    x_col = columns[0] if columns[0] in df.columns else df.columns[0]
-                    y_col = columns[1] if columns[1] in df.columns else df.select_dtypes(include=['number']).columns[0]
-                    code = self.generate_bar_chart_code(
-                        x_col, y_col, df, 
-                        parsed['aggregation'], parsed['sorting']
-                    )
-                else:
-                    # Default bar chart - find suitable columns
-                    cat_cols = df.select_dtypes(include=['object', 'category']).columns
-                    num_cols = df.select_dtypes(include=['number']).columns
-                    
-                    if len(cat_cols) > 0 and len(num_cols) > 0:
-                        x_col = cat_cols[0]
-                        y_col = num_cols[0]
-                    else:
-                        x_col = df.columns[0]
-                        y_col = df.columns[1] if len(df.columns) > 1 else df.columns[0]
-                    
-                    code = self.generate_bar_chart_code(
-                        x_col, y_col, df,
-                        parsed['aggregation'], parsed['sorting']
-                    )
-            
-            elif chart_type == 'scatter':
-                if len(columns) >= 2:
-                    x_col = columns[0] if columns[0] in df.columns else df.select_dtypes(include=['number']).columns[0]
-                    y_col = columns[1] if columns[1] in df.columns else df.select_dtypes(include=['number']).columns[1]
-                    color_col = columns[2] if len(columns) > 2 and columns[2] in df.columns else None
-                    code = self.generate_scatter_code(x_col, y_col, color_col, df)
-                else:
-                    # Find two numeric columns
-                    num_cols = df.select_dtypes(include=['number']).columns
-                    if len(num_cols) >= 2:
-                        code = self.generate_scatter_code(num_cols[0], num_cols[1], None, df)
-                    else:
-                        code = self.generate_scatter_code(df.columns[0], df.columns[1], None, df)
-            
-            elif chart_type == 'heatmap':
-                if len(columns) >= 2:
-                    # Filter to only existing numeric columns
-                    valid_cols = [col for col in columns if col in df.columns and df[col].dtype in ['int64', 'float64']]
-                    if len(valid_cols) >= 2:
-                        code = self.generate_heatmap_code(valid_cols)
-                    else:
-                        # Use numeric columns from dataframe
-                        num_cols = df.select_dtypes(include=['number']).columns.tolist()[:4]
-                        code = self.generate_heatmap_code(num_cols if len(num_cols) >= 2 else df.columns.tolist()[:4])
-                else:
-                    # Get numeric columns for correlation
-                    num_cols = df.select_dtypes(include=['number']).columns.tolist()[:4]
-                    code = self.generate_heatmap_code(num_cols if len(num_cols) >= 2 else df.columns.tolist()[:4])
-            
-            elif chart_type == 'treemap':
-                if len(columns) >= 2:
-                    # values_col should be numeric, group_col can be categorical
-                    group_col = columns[0] if columns[0] in df.columns else df.columns[0]
-                    values_col = columns[1] if columns[1] in df.columns else df.select_dtypes(include=['number']).columns[0]
-                    code = self.generate_treemap_code(values_col, group_col)
-                else:
-                    # Find suitable columns
-                    cat_cols = df.select_dtypes(include=['object', 'category']).columns
-                    num_cols = df.select_dtypes(include=['number']).columns
-                    
-                    if len(cat_cols) > 0 and len(num_cols) > 0:
-                        code = self.generate_treemap_code(num_cols[0], cat_cols[0])
-                    else:
-                        code = self.generate_treemap_code(df.columns[1] if len(df.columns) > 1 else df.columns[0], df.columns[0])
-            
-            else:
-                # Default to bar chart
-                code = self.generate_bar_chart_code('education_Graduation', 'MntTotal', df)
+        # Unknown chart types get the default bar chart
+        build_code = self._code_builders.get(chart_type, self._default_code)
         
+        try:
+            code = build_code(parsed, df, num_cols, cat_cols)
         except Exception as e:
             # Fallback: simple bar chart
             code = f"""
@@ -405,16 +369,98 @@ fig.update_layout(height=500)
         
         return code, chart_type
     
+    def _kpi_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """KPI card for the first requested column (Response by default)"""
+        columns = parsed['columns']
+        metric_col = columns[0] if columns else 'Response'
+        return self.generate_kpi_code(metric_col, df, parsed['color_condition'])
+    
+    def _bar_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """Bar chart of the requested columns, or the first categorical vs numeric pair"""
+        columns = parsed['columns']
+        if len(columns) >= 2:
+            # Check if columns exist
+            x_col = columns[0] if columns[0] in df.columns else df.columns[0]
+            y_col = columns[1] if columns[1] in df.columns else num_cols[0]
+        elif len(cat_cols) > 0 and len(num_cols) > 0:
+            # Default bar chart - find suitable columns
+            x_col = cat_cols[0]
+            y_col = num_cols[0]
+        else:
+            x_col = df.columns[0]
+            y_col = df.columns[1] if len(df.columns) > 1 else df.columns[0]
+        
+        return self.generate_bar_chart_code(
+            x_col, y_col, df,
+            parsed['aggregation'], parsed['sorting']
+        )
+    
+    def _scatter_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """Scatter plot of the requested columns, or the first two numeric ones"""
+        columns = parsed['columns']
+        if len(columns) >= 2:
+            x_col = columns[0] if columns[0] in df.columns else num_cols[0]
+            y_col = columns[1] if columns[1] in df.columns else num_cols[1]
+            color_col = columns[2] if len(columns) > 2 and columns[2] in df.columns else None
+            return self.generate_scatter_code(x_col, y_col, color_col, df)
+        
+        # Find two numeric columns
+        if len(num_cols) >= 2:
+            return self.generate_scatter_code(num_cols[0], num_cols[1], None, df)
+        return self.generate_scatter_code(df.columns[0], df.columns[1], None, df)
+    
+    def _heatmap_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """Correlation heatmap of the requested numeric columns, or the first four"""
+        columns = parsed['columns']
+        if len(columns) >= 2:
+            # Filter to only existing numeric columns
+            valid_cols = [col for col in columns if col in num_cols]
+            if len(valid_cols) >= 2:
+                return self.generate_heatmap_code(valid_cols)
+        
+        # Get numeric columns for correlation
+        heatmap_cols = num_cols.tolist()[:4]
+        return self.generate_heatmap_code(heatmap_cols if len(heatmap_cols) >= 2 else df.columns.tolist()[:4])
+    
+    def _treemap_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """Treemap of the requested group/value columns, or the first categorical/numeric pair"""
+        columns = parsed['columns']
+        if len(columns) >= 2:
+            # values_col should be numeric, group_col can be categorical
+            group_col = columns[0] if columns[0] in df.columns else df.columns[0]
+            values_col = columns[1] if columns[1] in df.columns else num_cols[0]
+            return self.generate_treemap_code(values_col, group_col)
+        
+        # Find suitable columns
+        if len(cat_cols) > 0 and len(num_cols) > 0:
+            return self.generate_treemap_code(num_cols[0], cat_cols[0])
+        return self.generate_treemap_code(df.columns[1] if len(df.columns) > 1 else df.columns[0], df.columns[0])
+    
+    def _default_code(self, parsed: dict, df: pd.DataFrame, num_cols: pd.Index, cat_cols: pd.Index) -> str:
+        """Default to bar chart"""
+        return self.generate_bar_chart_code('education_Graduation', 'MntTotal', df)
+    
     def execute_visualization_code(self, code: str, df: pd.DataFrame):
         """
         Safely executes the generated code and returns the figure
         """
+        fig, _ = self.run_visualization_code(code, df)
+        return fig
+    
+    def run_visualization_code(self, code: str, df: pd.DataFrame) -> tuple:
+        """
+        Safely executes the generated code
+        Returns: (figure, succeeded) - succeeded is False when the figure is a
+        fallback or error figure rather than the one the code builds
+        """
+        succeeded = True
         try:
             # Validate and fix common code issues before execution
             sanitized_code = self._sanitize_code(code, df)
             
             # If sanitization failed, regenerate with rule-based approach
             if sanitized_code is None:
+                succeeded = False
                 print("Warning: Code sanitization failed, regenerating with rule-based approach...")
                 # Use a simple bar chart as fallback
                 cat_cols = df.select_dtypes(include=['object', 'category']).columns
@@ -453,11 +499,12 @@ fig.update_layout(height=500)
             
             if fig is None:
                 # Try to create a simple fallback visualization
+                succeeded = False
                 print("Warning: No figure was created. Creating fallback...")
                 fig = px.scatter(df.head(100), x=df.columns[0], y=df.columns[1], 
                                title='Fallback Visualization', template='plotly_dark')
             
-            return fig
+            return fig, succeeded
         
         except Exception as e:
             print(f"Error executing visualization code: {str(e)}")
@@ -478,7 +525,7 @@ fig.update_layout(height=500)
                 xaxis=dict(visible=False),
                 yaxis=dict(visible=False)
             )
-            return error_fig
+            return error_fig, False
     
     def _sanitize_code(self, code: str, df: pd.DataFrame) -> str:
         """
@@ -525,8 +572,8 @@ fig.update_layout(height=500)
                 else:
                     return None  # Can't fix, force rule-based
         
-        # Fix 5: Check for groupby column references
-        groupby_pattern = r"groupby\('([^']+)'\)"
+        # Fix 5: Check for groupby column references (with or without keyword arguments)
+        groupby_pattern = r"groupby\('([^']+)'(?=[,)])"
         groupby_cols = re.findall(groupby_pattern, code)
         for col in groupby_cols:
             if col not in df.columns:
@@ -535,7 +582,7 @@ fig.update_layout(height=500)
                 matches = get_close_matches(col, df.columns, n=1, cutoff=0.6)
                 if matches:
                     print(f"  -> Replacing with '{matches[0]}'")
-                    code = code.replace(f"groupby('{col}')", f"groupby('{matches[0]}')")
+                    code = re.sub(rf"groupby\('{re.escape(col)}'(?=[,)])", lambda m: f"groupby('{matches[0]}'", code)
                 else:
                     return None
         
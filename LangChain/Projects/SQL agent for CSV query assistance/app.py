@@ -5,6 +5,7 @@ from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import create_sql_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+import re
 import time
 
 # Page configuration
@@ -14,6 +15,18 @@ st.set_page_config(
     layout="wide"
 )
 
+# Rows per executemany batch when writing uploads to SQLite
+SQL_WRITE_CHUNKSIZE = 10_000
+
+# Table names are SQL identifiers, not bound parameters, so only allow safe ones
+TABLE_NAME_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{0,62}')
+
+# Separators mapped to underscores in a single pass by clean_column_name
+COLUMN_SEPARATORS = str.maketrans({' ': '_', '-': '_'})
+
+# Anything that is not a letter, digit or underscore is dropped from column names
+NON_IDENTIFIER_CHARS = re.compile(r'\W+')
+
 # Title and description
 st.title("📊 CSV Query Assistant with AI")
 st.markdown("Upload a CSV file, and ask questions about your data using natural language!")
@@ -44,49 +57,82 @@ if 'table_name' not in st.session_state:
 
 def clean_column_name(col):
     """Clean column names to be SQL-friendly"""
-    col = str(col).strip()
-    col = col.replace(' ', '_')
-    col = col.replace('-', '_')
-    col = ''.join(c for c in col if c.isalnum() or c == '_')
+    col = str(col).strip().translate(COLUMN_SEPARATORS)
+    col = NON_IDENTIFIER_CHARS.sub('', col)
     if col[0].isdigit():
         col = 'col_' + col
     return col.lower()
 
+@st.cache_resource
+def init_database(db_path):
+    """Enable WAL once per process; the journal mode is persisted in the database file"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    return db_path
+
 def process_csv_to_db(uploaded_file, table_name='user_data'):
     """Process uploaded CSV and store in SQLite database"""
+    if not TABLE_NAME_PATTERN.fullmatch(table_name):
+        return False, None, 0, f"Invalid table name: {table_name!r}"
+    
+    staging_table = f'{table_name}__staging'
+    conn = None
     try:
-        # Read CSV
+        # Read CSV (whole file, so column types are inferred from every row)
         df = pd.read_csv(uploaded_file)
+        if df.empty:
+            return False, None, 0, "The CSV file contains no data rows"
         
         # Clean column names
         df.columns = [clean_column_name(col) for col in df.columns]
         
         # Connect to database
-        conn = sqlite3.connect('user_data.db')
-        
-        # Drop table if exists and create new one
-        cursor = conn.cursor()
-        cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
-        
-        # Store DataFrame to SQL
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
+        conn = sqlite3.connect(init_database('user_data.db'))
+        # WAL lets the agent keep reading while we write; NORMAL sync skips the
+        # per-commit fsync, and temp B-trees stay in memory during the load
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+
+        # Store DataFrame in a staging table in bounded batches instead of one
+        # row list (if_exists='replace' drops any leftover staging table)
+        df.to_sql(staging_table, conn, if_exists='replace', index=False,
+                  chunksize=SQL_WRITE_CHUNKSIZE)
         
+        # Swap the fully loaded table in with one transaction, so a failed
+        # upload never leaves the agent querying a half-written table
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(f'ALTER TABLE "{staging_table}" RENAME TO "{table_name}"')
         conn.commit()
-        conn.close()
         
-        return True, df, None
+        return True, df.head(10), len(df), None
     except Exception as e:
-        return False, None, str(e)
+        if conn is not None:
+            # Every table is visible to the agent, so never leave a
+            # half-loaded staging table behind
+            try:
+                conn.rollback()
+                conn.execute(f'DROP TABLE IF EXISTS "{staging_table}"')
+                conn.commit()
+            except sqlite3.Error:
+                pass  # report the original error, not the cleanup one
+        return False, None, 0, str(e)
+    finally:
+        if conn is not None:
+            conn.close()
 
-def create_agent():
-    """Create LangChain SQL agent"""
-    if not os.environ.get("GOOGLE_API_KEY"):
+@st.cache_resource(show_spinner=False)
+def create_agent(api_key):
+    """Create LangChain SQL agent (shared until the API key or the table changes)"""
+    if not api_key:
         return None
     
     db = SQLDatabase.from_uri("sqlite:///user_data.db")
     llm = ChatGoogleGenerativeAI(
         model="gemini-2.5-flash-lite",
-        temperature=0
+        temperature=0,
+        google_api_key=api_key
     )
     
     agent = create_sql_agent(
@@ -100,6 +146,10 @@ def create_agent():
     
     return agent
 
+def clear_chat_history():
+    """Button callback: clears history before the rerun the click triggers"""
+    st.session_state.chat_history = []
+
 def ask_question(agent, question):
     """Ask a question to the agent with retry logic"""
     max_retries = 2
@@ -131,22 +181,24 @@ with col1:
         # Process button
         if st.button("🔄 Process and Load Data", type="primary"):
             with st.spinner("Processing CSV file..."):
-                success, df, error = process_csv_to_db(uploaded_file, 'user_data')
+                success, preview, row_count, error = process_csv_to_db(uploaded_file, 'user_data')
                 
                 if success:
+                    # The cached agent reflected the old schema; rebuild on next question
+                    create_agent.clear()
                     st.session_state.db_ready = True
                     st.session_state.table_name = 'user_data'
                     st.success("✅ Data loaded successfully!")
                     
                     # Show preview
                     st.subheader("📋 Data Preview")
-                    st.dataframe(df.head(10), width ='stretch')
+                    st.dataframe(preview, width ='stretch')
                     
                     # Show statistics
                     st.subheader("📊 Data Statistics")
-                    st.write(f"**Rows:** {len(df)}")
-                    st.write(f"**Columns:** {len(df.columns)}")
-                    st.write(f"**Column Names:** {', '.join(df.columns)}")
+                    st.write(f"**Rows:** {row_count}")
+                    st.write(f"**Columns:** {len(preview.columns)}")
+                    st.write(f"**Column Names:** {', '.join(preview.columns)}")
                 else:
                     st.error(f"❌ Error processing file: {error}")
 
@@ -168,13 +220,11 @@ with col2:
         with col_btn1:
             ask_btn = st.button("🚀 Ask", type="primary")
         with col_btn2:
-            if st.button("🗑️ Clear History"):
-                st.session_state.chat_history = []
-                st.rerun()
+            st.button("🗑️ Clear History", on_click=clear_chat_history)
         
         if ask_btn and question:
             with st.spinner("🤔 Thinking..."):
-                agent = create_agent()
+                agent = create_agent(api_key)
                 
                 if agent:
                     answer, error = ask_question(agent, question)